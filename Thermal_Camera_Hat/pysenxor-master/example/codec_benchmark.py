@@ -0,0 +1,137 @@
+# Benchmark of senxor.codec on synthetic and recorded MI48 scenes.
+#
+# Synthetic scenes only:
+#   python3 codec_benchmark.py
+# A recording: an (N, 62, 80) uint16 deci-Kelvin .npy stack ...
+#   python3 codec_benchmark.py --npy frames.npy
+# ... or frames pulled live from the ONVIF server's /raw/stream:
+#   python3 codec_benchmark.py --url http://admin:admin@pi:8000/raw/stream --frames 250 --save frames.npy
+#
+import argparse
+import base64
+import struct
+import sys
+import time
+import urllib.parse
+import urllib.request
+import zlib
+
+import numpy as np
+
+from senxor.codec import FrameEncoder, FrameDecoder, _lz4
+
+SHAPE = (62, 80)
+ROOM  = 2960    # deci-Kelvin, 22.85 °C
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='senxor.codec benchmark')
+    parser.add_argument('--npy', action='append', default=[],
+                        help='recorded (N, 62, 80) uint16 deci-Kelvin stack (repeatable)')
+    parser.add_argument('--url', help='record from a /raw/stream URL (user:password@ for auth)')
+    parser.add_argument('--frames', type=int, default=250, help='frames per scene')
+    parser.add_argument('--noise', type=float, default=1.5,
+                        help='synthetic sensor noise, deci-Kelvin (1 sigma)')
+    parser.add_argument('--save', help='save the --url recording to this .npy file')
+    return parser.parse_args()
+
+
+def synthetic_scenes(n, noise, seed=0):
+    """Yield (name, frames) for a few typical scenes at 25 FPS."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:SHAPE[0], 0:SHAPE[1]]
+    background = ROOM + 0.4 * xx + 0.2 * yy       # gentle gradient, e.g. a wall near a window
+
+    def frames(fn):
+        out = np.empty((n,) + SHAPE, np.uint16)
+        for t in range(n):
+            out[t] = np.clip(np.rint(fn(t) + rng.normal(0, noise, SHAPE)), 0, 65535)
+        return out
+
+    def person(t, x0=5, speed=0.4):
+        cx = x0 + speed * t % (SHAPE[1] + 20) - 10
+        body = np.exp(-(((xx - cx) / 6) ** 2 + ((yy - 36) / 18) ** 2) ** 2)
+        head = np.exp(-((xx - cx) ** 2 + (yy - 12) ** 2) / 18)
+        return background + 110 * body + 130 * head
+
+    yield 'static room', frames(lambda t: background)
+    yield 'walking person', frames(person)
+    yield 'hot spot (kettle)', frames(lambda t: background
+                                      + 700 * np.exp(-((xx - 60) ** 2 + (yy - 20) ** 2) / 4))
+    yield 'scene cuts (pan)', frames(lambda t: np.roll(person(t), (t // 25) * 17, axis=1)
+                                     + 40 * ((t // 25) % 2))
+
+
+def record(url, n):
+    """Pull `n` frames from /raw/stream (plain pixels) into an (n, rows, cols) array."""
+    parts = urllib.parse.urlsplit(url)
+    request = urllib.request.Request(parts._replace(netloc=parts.hostname + (
+        ':%d' % parts.port if parts.port else '')).geturl())
+    if parts.username:
+        token = base64.b64encode(('%s:%s' % (parts.username, parts.password or '')).encode())
+        request.add_header('Authorization', 'Basic ' + token.decode())
+    frames = []
+    with urllib.request.urlopen(request, timeout=10) as stream:
+        while len(frames) < n:
+            length, = struct.unpack('<I', stream.read(4))
+            rec = stream.read(length)
+            rows, cols = struct.unpack_from('<HH', rec, 20)
+            frames.append(np.frombuffer(rec, '<u2', rows * cols, 24).reshape(rows, cols))
+    return np.stack(frames)
+
+
+def bench(frames, **kwargs):
+    """Return (ratio, encode ms/frame, decode ms/frame, keyframes) for one codec setting."""
+    enc, dec = FrameEncoder(**kwargs), FrameDecoder()
+    t0 = time.perf_counter()
+    encoded = [enc.encode(f) for f in frames]
+    t1 = time.perf_counter()
+    decoded = [dec.decode(d) for d in encoded]
+    t2 = time.perf_counter()
+    if not np.array_equal(np.stack(decoded), frames):
+        raise AssertionError('codec is not lossless for %r' % (kwargs,))
+    n = len(frames)
+    keys = sum(d[2] & 1 for d in encoded)
+    return frames.nbytes / sum(map(len, encoded)), (t1 - t0) * 1e3 / n, (t2 - t1) * 1e3 / n, keys
+
+
+def baseline(frames):
+    """zlib straight on the pixels – what a generic compressor manages alone."""
+    t0 = time.perf_counter()
+    size = sum(len(zlib.compress(f.tobytes(), 1)) for f in frames)
+    return frames.nbytes / size, (time.perf_counter() - t0) * 1e3 / len(frames)
+
+
+def main():
+    args = parse_args()
+    scenes = list(synthetic_scenes(args.frames, args.noise))
+    for path in args.npy:
+        scenes.append((path, np.load(path).astype(np.uint16)))
+    if args.url:
+        rec = record(args.url, args.frames)
+        if args.save:
+            np.save(args.save, rec)
+        scenes.append(('recorded', rec))
+
+    settings = [dict(keyint=1, compressor=None), dict(keyint=25, compressor=None),
+                dict(keyint=25, compressor='zlib', level=1),
+                dict(keyint=250, compressor='zlib', level=1),
+                dict(keyint=25, compressor='zlib', level=9)]
+    if _lz4 is not None:
+        settings.append(dict(keyint=25, compressor='lz4', level=0))
+
+    print('%-20s %-22s %7s %9s %9s %5s' % ('scene', 'codec', 'ratio', 'enc ms', 'dec ms', 'keys'))
+    for name, frames in scenes:
+        ratio, ms = baseline(frames)
+        print('%-20s %-22s %6.2fx %9.3f %9s %5s' % (name, 'zlib(1) on pixels', ratio, ms, '', ''))
+        for kw in settings:
+            label = 'key %d, %s' % (kw['keyint'], kw['compressor'] or 'bits only')
+            if kw.get('level') not in (None, 1, 0):
+                label += '(%d)' % kw['level']
+            ratio, enc_ms, dec_ms, keys = bench(frames, **kw)
+            print('%-20s %-22s %6.2fx %9.3f %9.3f %5d' % ('', label, ratio, enc_ms, dec_ms, keys))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""
+Lossless codec for MI48 raw frames (uint16 deci-Kelvin).
+
+Neighbouring pixels are strongly correlated and most pixels change by a
+few deci-Kelvin between frames, so a frame of 62 × 80 × 16 bit shrinks
+several times once it is predicted and the residuals are stored in as few
+bits as they need.  Encoding and decoding are whole-array numpy operations
+(no per-pixel Python loop).
+
+Per frame:
+
+1. Prediction.  A keyframe is predicted spatially, from the left, upper and
+   upper-left neighbours (left + up − upper-left, the planar predictor of
+   PNG/LOCO-I); the decoder inverts it with two cumulative sums.  Other
+   frames are predicted from the previous frame; the encoder falls back to
+   a keyframe when that is cheaper (scene change) and forces one every
+   `keyint` frames so that a reader can start decoding there.
+2. Zigzag mapping of the signed residuals (0, −1, 1, −2 … → 0, 1, 2, 3 …).
+3. Bit packing with a per-frame width b, chosen to minimise the size:
+   residuals that do not fit in b bits are stored as exceptions (pixel
+   index and high bits, both u16) - "patched" frame-of-reference packing,
+   so a single hot pixel does not widen the whole frame.  The u16 index
+   limits a frame to 65535 pixels (MI48: 4960); `encode` refuses larger.
+4. Optionally a general-purpose compressor over the packed bytes: 'zlib'
+   (standard library) or 'lz4' (lz4 package, if installed).
+
+Encoded frame (little-endian)
+-----------------------------
+  0  2s   magic           b'SX'
+  2  u8   flags           bit 0: keyframe; bits 1-2: compressor (0 none, 1 zlib, 2 lz4)
+  3  u8   bit width b     1 - 16
+  4  u16  rows
+  6  u16  cols
+  8  u16  base            keyframe: value subtracted before prediction
+ 10  u16  exceptions      number of residuals wider than b bits
+ 12  ...  payload         (compressed) packed residuals, then the exception
+                          indices and high bits
+
+Example::
+
+    enc, dec = FrameEncoder(), FrameDecoder()
+    data  = enc.encode(frame)           # bytes, typically 1.5-2.5 kB for 9.9 kB in
+    again = dec.decode(data)            # == frame
+"""
+
+import struct
+import zlib
+
+import numpy as np
+
+try:
+    import lz4.frame as _lz4
+except ImportError:   # optional back end
+    _lz4 = None
+
+MAGIC = b'SX'
+
+_HEADER = struct.Struct('<2sBBHHHH')   # magic, flags, bits, rows, cols, base, exceptions
+_KEY = 0x01
+COMPRESSORS = {None: 0, 'zlib': 1, 'lz4': 2}
+_COMPRESSOR_NAMES = {v: k for k, v in COMPRESSORS.items()}
+_EXCEPTION_COST = 4                    # bytes per exception: u16 index + u16 high bits
+_MAX_BITS = 17                         # zigzag of a 16-bit difference
+
+
+def zigzag(residual):
+    """Map signed residuals to unsigned: 0, -1, 1, -2, ... → 0, 1, 2, 3, ..."""
+    r = np.asarray(residual, np.int32)
+    return ((r << 1) ^ (r >> 31)).astype(np.uint32)
+
+
+def unzigzag(z):
+    """Inverse of zigzag()."""
+    z = np.asarray(z, np.uint32)
+    return (z >> 1).astype(np.int32) ^ -(z & 1).astype(np.int32)
+
+
+def predict_spatial(frame, base):
+    """Keyframe residual: (frame − base) minus its left + up − upper-left prediction."""
+    x = np.asarray(frame, np.int32) - base
+    r = x.copy()
+    r[1:, :] -= x[:-1, :]
+    r[:, 1:] -= x[:, :-1]
+    r[1:, 1:] += x[:-1, :-1]
+    return r
+
+
+def unpredict_spatial(residual, base):
+    """Inverse of predict_spatial()."""
+    return np.cumsum(np.cumsum(residual, axis=0), axis=1) + base
+
+
+def _bit_lengths(z):
+    # frexp's exponent is the bit length for z > 0, and 0 for z == 0
+    return np.frexp(z.astype(np.float64))[1]
+
+
+def choose_width(z):
+    """Return (bits, packed size in bytes) minimising packed residuals + exceptions."""
+    counts = np.bincount(_bit_lengths(z).ravel(), minlength=_MAX_BITS + 2)
+    wider  = np.cumsum(counts[::-1])[::-1]          # wider[b] = residuals of bit length >= b
+    best = None
+    # b = 0 would need exceptions with 17-bit high parts; start at 1
+    for b in range(1, _MAX_BITS):
+        size = (z.size * b + 7) // 8 + int(wider[b + 1]) * _EXCEPTION_COST
+        if best is None or size < best[1]:
+            best = (b, size)
+    return best
+
+
+def pack_bits(values, bits):
+    """Pack unsigned `values` into `bits` bits each (little-endian bit order)."""
+    if bits == 0:
+        return b''
+    v = np.asarray(values, np.uint32).ravel()
+    planes = ((v[:, None] >> np.arange(bits, dtype=np.uint32)) & 1).astype(np.uint8)
+    return np.packbits(planes.ravel(), bitorder='little').tobytes()
+
+
+def unpack_bits(data, bits, count):
+    """Inverse of pack_bits(); returns `count` uint32 values."""
+    if bits == 0:
+        return np.zeros(count, np.uint32)
+    planes = np.unpackbits(np.frombuffer(data, np.uint8), count=count * bits,
+                           bitorder='little').reshape(count, bits)
+    return planes.astype(np.uint32) @ (np.uint32(1) << np.arange(bits, dtype=np.uint32))
+
+
+def _compress(payload, compressor, level):
+    if compressor == 'zlib':
+        return zlib.compress(payload, level)
+    if compressor == 'lz4':
+        return _lz4.compress(payload, compression_level=level)
+    return payload
+
+
+def _decompress(payload, compressor):
+    if compressor == 'zlib':
+        return zlib.decompress(payload)
+    if compressor == 'lz4':
+        if _lz4 is None:
+            raise ValueError('frame is lz4-compressed but the lz4 package is not installed')
+        return _lz4.decompress(payload)
+    return payload
+
+
+def is_keyframe(data):
+    """True if encoded frame `data` decodes without a reference frame."""
+    return bool(data[2] & _KEY)
+
+
+class FrameEncoder:
+    """Encode a sequence of raw frames (one encoder per stream).
+
+    `keyint` is the keyframe interval in frames (1: every frame stands
+    alone); `compressor` None, 'zlib' or 'lz4'; `level` its compression
+    level (zlib 0-9, lz4 0-16).
+    """
+
+    def __init__(self, keyint=25, compressor='zlib', level=1):
+        if compressor not in COMPRESSORS:
+            raise ValueError('compressor must be one of %s' % list(COMPRESSORS))
+        if compressor == 'lz4' and _lz4 is None:
+            raise ValueError("compressor 'lz4' needs the lz4 package (pip install lz4)")
+        self.keyint     = max(int(keyint), 1)
+        self.compressor = compressor
+        self.level      = level
+        self.reset()
+
+    def reset(self):
+        """Start over: the next frame is a keyframe."""
+        self._ref   = None
+        self._since = 0     # frames since the last keyframe
+
+    def encode(self, frame, key=False):
+        """Return `frame` (2-D uint16) as bytes; `key` forces a keyframe."""
+        frame = np.asarray(frame)
+        if frame.ndim != 2:
+            raise ValueError('expected a 2-D frame, got shape %s' % (frame.shape,))
+        if frame.size > 0xFFFF:
+            raise ValueError('frame of %d pixels exceeds the codec limit of 65535' % frame.size)
+        ref = self._ref
+        key = (key or ref is None or ref.shape != frame.shape
+               or self._since + 1 >= self.keyint)
+        base = 0
+        if not key:
+            z = zigzag(frame.astype(np.int32) - ref)
+            bits, size = choose_width(z)
+            # scene change: spatial prediction may beat the previous frame
+            base_k = int(frame.flat[0])
+            z_k = zigzag(predict_spatial(frame, base_k))
+            bits_k, size_k = choose_width(z_k)
+            if size_k < size:
+                key, z, bits, base = True, z_k, bits_k, base_k
+        else:
+            base = int(frame.flat[0])
+            z = zigzag(predict_spatial(frame, base))
+            bits, _ = choose_width(z)
+        self._since = 0 if key else self._since + 1
+        self._ref = frame.astype(np.uint16, copy=True)
+
+        z = z.ravel()
+        over = np.flatnonzero(z >> bits)
+        payload = pack_bits(z & ((1 << bits) - 1), bits)
+        if over.size:
+            payload += over.astype('<u2').tobytes() + (z[over] >> bits).astype('<u2').tobytes()
+        flags = (_KEY if key else 0) | COMPRESSORS[self.compressor] << 1
+        rows, cols = frame.shape
+        return (_HEADER.pack(MAGIC, flags, bits, rows, cols, base, over.size)
+                + _compress(payload, self.compressor, self.level))
+
+
+class FrameDecoder:
+    """Decode frames produced by a FrameEncoder, in order.
+
+    A decoder that joins a stream late skips (returns None for) frames until
+    the first keyframe.
+    """
+
+    def __init__(self):
+        self._ref = None
+
+    def reset(self):
+        self._ref = None
+
+    def decode(self, data):
+        """Return the frame as a 2-D uint16 array, or None while waiting for a keyframe."""
+        magic, flags, bits, rows, cols, base, nexc = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError('not an encoded frame')
+        key = flags & _KEY
+        if not key and (self._ref is None or self._ref.shape != (rows, cols)):
+            return None
+        compressor = _COMPRESSOR_NAMES.get((flags >> 1) & 0x3, 'unknown')
+        payload = _decompress(memoryview(data)[_HEADER.size:], compressor)
+        n = rows * cols
+        npacked = (n * bits + 7) // 8
+        z = unpack_bits(payload[:npacked], bits, n)
+        if nexc:
+            idx  = np.frombuffer(payload, '<u2', nexc, npacked)
+            high = np.frombuffer(payload, '<u2', nexc, npacked + 2 * nexc)
+            z[idx] |= high.astype(np.uint32) << bits
+        r = unzigzag(z).reshape(rows, cols)
+        if key:
+            frame = unpredict_spatial(r, base)
+        else:
+            frame = self._ref.astype(np.int32) + r
+        self._ref = frame.astype(np.uint16)
+        return self._ref.copy()
+
+
+def encode_frames(frames, **kwargs):
+    """Encode an iterable of frames with one FrameEncoder; returns a list of bytes."""
+    enc = FrameEncoder(**kwargs)
+    return [enc.encode(f) for f in frames]
+
+
+def decode_frames(encoded):
+    """Decode a list produced by encode_frames(); returns a (N, rows, cols) uint16 array."""
+    dec = FrameDecoder()
+    return np.stack([dec.decode(d) for d in encoded])
@@ -0,0 +1,254 @@
+"""
+Shared-memory frame bus: the latest MI48 frame in a memory-mapped file.
+
+A server that owns the camera publishes every frame with `FrameBusWriter`;
+co-located processes read it with `FrameBusReader` without sockets,
+authentication or JPEG decoding.  The file normally lives in /dev/shm
+(e.g. /dev/shm/onvif-thermal.frame), so it never touches storage.
+
+File layout (little-endian, offsets in bytes)
+---------------------------------------------
+  0  8s   magic            b'SNXRFB01'
+  8  u32  header size      (128)
+ 12  u32  file size
+ 16  u64  seqlock          odd while the writer is copying, even when stable
+ 24  u64  seq              frame sequence number (0 = no frame yet)
+ 32  f64  timestamp        time.time() of the frame
+ 40  f32  lo, hi           display range of the canvas, °C
+ 48  u32  raw offset       raw frame: rows × cols, dtype '<u2', deci-Kelvin
+ 52  u16  raw rows
+ 54  u16  raw cols
+ 56  u32  canvas offset    rendered image: height × width × 3, dtype '|u1', BGR
+ 60  u16  canvas height
+ 62  u16  canvas width
+ 64  u32  jpeg offset      encoded canvas
+ 68  u32  jpeg length
+ 72  u32  jpeg capacity
+ 76  u32  writer pid
+ 80  ...  reserved up to 128
+
+°C = raw / 10 - 273.15.
+
+A reader copies (or uses) the data and then checks that `seqlock` is even
+and unchanged; otherwise the writer overwrote the frame meanwhile and the
+read is retried.  The writer creates the file under a temporary name and
+renames it into place, so a reader never maps a half-initialised header; a
+restarted writer produces a new file, which readers pick up by comparing
+inode numbers.
+"""
+
+import mmap
+import os
+import struct
+import time
+from collections import namedtuple
+
+import numpy as np
+
+MAGIC       = b'SNXRFB01'
+HEADER_SIZE = 128
+KELVIN_0    = -273.15
+
+_HEADER  = struct.Struct('<8sII')                       # magic, header size, file size
+_SEQLOCK = struct.Struct('<Q')                          # at 16
+_FRAME   = struct.Struct('<Qdff')                       # at 24: seq, timestamp, lo, hi
+_LAYOUT  = struct.Struct('<IHHIHHIIII')                 # at 48: raw, canvas, jpeg, pid
+_SEQLOCK_OFF = 16
+_FRAME_OFF   = 24
+_LAYOUT_OFF  = 48
+
+Frame = namedtuple('Frame', 'seq timestamp lo hi raw canvas jpeg lock')
+Frame.__doc__ = """One frame from the bus.
+
+raw (uint16 deci-Kelvin) and canvas (uint8 BGR) are numpy arrays, jpeg is
+a bytes-like object.  `lock` is the seqlock value the frame was read under
+(used by FrameBusReader.changed()).
+"""
+
+
+def _align(n, to=64):
+    return (n + to - 1) // to * to
+
+
+class FrameBusWriter:
+    """Publish frames into a memory-mapped file (one writer per file)."""
+
+    def __init__(self, path, raw_shape, canvas_shape, jpeg_capacity=None, mode=0o644):
+        self.path = path
+        rows, cols = raw_shape
+        height, width = canvas_shape[:2]
+        if jpeg_capacity is None:
+            jpeg_capacity = height * width * 3   # an encoded frame never exceeds the bitmap
+        raw_off    = HEADER_SIZE
+        canvas_off = _align(raw_off + rows * cols * 2)
+        jpeg_off   = _align(canvas_off + height * width * 3)
+        size       = _align(jpeg_off + jpeg_capacity, mmap.PAGESIZE)
+
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        fd = os.open(tmp, os.O_RDWR | os.O_CREAT | os.O_TRUNC, mode)
+        try:
+            os.fchmod(fd, mode)    # not subject to the umask
+            os.ftruncate(fd, size)
+            self._mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        _HEADER.pack_into(self._mm, 0, MAGIC, HEADER_SIZE, size)
+        _LAYOUT.pack_into(self._mm, _LAYOUT_OFF, raw_off, rows, cols,
+                          canvas_off, height, width, jpeg_off, 0, jpeg_capacity, os.getpid())
+        os.rename(tmp, path)
+
+        self._lock   = 0
+        self._raw    = np.ndarray((rows, cols), '<u2', self._mm, raw_off)
+        self._canvas = np.ndarray((height, width, 3), np.uint8, self._mm, canvas_off)
+        self._jpeg_off = jpeg_off
+        self._jpeg_cap = jpeg_capacity
+
+    def write(self, seq, timestamp, raw, canvas=None, jpeg=None, lo=0.0, hi=0.0):
+        """Publish one frame.
+
+        `raw` is the sensor frame: uint16 deci-Kelvin as MI48.read() returns
+        it (copied as is), or any other dtype in °C (converted); `canvas` a
+        BGR image of the configured shape; `jpeg` any bytes-like object.  A
+        JPEG larger than the capacity is not stored (length 0).
+        """
+        mm = self._mm
+        njpeg = len(jpeg) if jpeg is not None else 0
+        if njpeg > self._jpeg_cap:
+            njpeg = 0
+        self._lock += 1
+        _SEQLOCK.pack_into(mm, _SEQLOCK_OFF, self._lock)
+        if getattr(raw, 'dtype', None) == np.uint16:
+            self._raw[...] = raw
+        else:
+            np.rint((np.asarray(raw, np.float32) - KELVIN_0) * 10, out=self._raw, casting='unsafe')
+        if canvas is not None:
+            self._canvas[...] = canvas
+        if njpeg:
+            mm[self._jpeg_off:self._jpeg_off + njpeg] = jpeg
+        struct.pack_into('<I', mm, _LAYOUT_OFF + 20, njpeg)
+        _FRAME.pack_into(mm, _FRAME_OFF, seq, timestamp, lo, hi)
+        self._lock += 1
+        _SEQLOCK.pack_into(mm, _SEQLOCK_OFF, self._lock)
+
+    def close(self, unlink=True):
+        self._raw = self._canvas = None
+        self._mm.close()
+        if unlink:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class FrameBusReader:
+    """Read frames published by a FrameBusWriter.
+
+    Example::
+
+        bus = FrameBusReader('/dev/shm/onvif-thermal.frame')
+        frame = bus.wait(timeout=1.0)          # copies, always consistent
+        print(frame.seq, frame.raw.max() / 10 + KELVIN_0)
+
+        frame = bus.view()                     # zero-copy views into the file
+        hot = (frame.raw > 3131).sum()         # ... use them ...
+        if bus.changed(frame):                 # overwritten meanwhile: discard
+            pass
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mm  = None
+        self._ino = None
+        self._open()
+
+    def _open(self):
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            st = os.fstat(fd)
+            mm = mmap.mmap(fd, st.st_size, prot=mmap.PROT_READ)
+        finally:
+            os.close(fd)
+        magic, hdr, size = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or size > len(mm):
+            mm.close()
+            raise ValueError('%s is not a frame bus file' % self.path)
+        if self._mm is not None:
+            self._close_map()
+        self._mm  = mm
+        self._ino = st.st_ino
+        (raw_off, rows, cols, canvas_off, height, width,
+         jpeg_off, _, _, self.writer_pid) = _LAYOUT.unpack_from(mm, _LAYOUT_OFF)
+        self.raw_shape    = (rows, cols)
+        self.canvas_shape = (height, width, 3)
+        self._raw    = np.ndarray(self.raw_shape, '<u2', mm, raw_off)
+        self._canvas = np.ndarray(self.canvas_shape, np.uint8, mm, canvas_off)
+        self._jpeg   = memoryview(mm)[jpeg_off:]
+
+    def reopen_if_replaced(self):
+        """Map the file again if the writer restarted (new inode).  Returns True if it did."""
+        try:
+            if os.stat(self.path).st_ino == self._ino:
+                return False
+        except FileNotFoundError:
+            return False
+        self._jpeg = self._raw = self._canvas = None
+        self._open()
+        return True
+
+    def _lock(self):
+        return _SEQLOCK.unpack_from(self._mm, _SEQLOCK_OFF)[0]
+
+    @property
+    def seq(self):
+        """Sequence number of the frame currently in the file."""
+        return _FRAME.unpack_from(self._mm, _FRAME_OFF)[0]
+
+    def view(self):
+        """Current frame as zero-copy views (check `changed()` after use)."""
+        while True:
+            lock = self._lock()
+            if lock & 1:
+                time.sleep(0.0005)
+                continue
+            seq, ts, lo, hi = _FRAME.unpack_from(self._mm, _FRAME_OFF)
+            njpeg = struct.unpack_from('<I', self._mm, _LAYOUT_OFF + 20)[0]
+            if self._lock() == lock:
+                return Frame(seq, ts, lo, hi, self._raw, self._canvas, self._jpeg[:njpeg], lock)
+
+    def changed(self, frame):
+        """True if `frame` (from view()) was overwritten while it was in use."""
+        return self._lock() != frame.lock
+
+    def read(self):
+        """Current frame as private copies, guaranteed untorn."""
+        while True:
+            f = self.view()
+            copy = f._replace(raw=f.raw.copy(), canvas=f.canvas.copy(), jpeg=bytes(f.jpeg))
+            if not self.changed(f):
+                return copy
+
+    def wait(self, last_seq=0, timeout=None, poll=0.005):
+        """Block (polling every `poll` s) until seq != last_seq; return read() or None on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        checked  = time.monotonic()
+        while True:
+            seq = self.seq
+            if seq and seq != last_seq:
+                return self.read()
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                return None
+            if now - checked >= 1.0:     # writer restarted → new file
+                self.reopen_if_replaced()
+                checked = now
+            time.sleep(poll)
+
+    def _close_map(self):
+        try:
+            self._mm.close()
+        except BufferError:
+            pass   # a caller still holds a view(); the mapping goes with the last reference
+
+    def close(self):
+        self._jpeg = self._raw = self._canvas = None
+        self._close_map()
@@ -0,0 +1,135 @@
+# Per-request SOAP parse + dispatch cost: _SoapRequest and the action table
+# against the substring / regex path they replaced (user-032).
+#
+# Runs on the Pi (the server module imports the camera libraries):
+#   python3 bench/soap_parse_benchmark.py
+#   python3 bench/soap_parse_benchmark.py --number 50000 my_capture_media_GetProfiles.xml
+#
+# Captures are named <client>_<service>_<action>.xml, service being device,
+# media or events.  The ones in soap_captures/ have the shape Synology
+# Surveillance Station (gSOAP) and ONVIF Device Manager send; credentials,
+# nonces and addresses are replaced.
+#
+import argparse
+import glob
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import onvif_thermal_server as server   # noqa: E402
+
+CAPTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'soap_captures')
+
+_BODY = r'<(?:[^:>\s]+:)?Body[^>]*>\s*<(?:[^:>\s]+:)?(\w+)'
+
+# The if/elif chains of the old _soap_device / _soap_media / _soap_events, in
+# their order: (substrings – any matches, branch, regex the branch ran).
+_LEGACY_CHAINS = {
+    'device': [
+        (('GetDeviceInformation',), 'GetDeviceInformation', None),
+        (('GetCapabilities',), 'GetCapabilities', None),
+        (('GetSystemDateAndTime',), 'GetSystemDateAndTime', None),
+        (('GetScopes',), 'GetScopes', None),
+        (('GetServices',), 'GetServices', None),
+        (('GetHostname',), 'GetHostname', None),
+        (('GetNetworkInterfaces',), 'GetNetworkInterfaces', None),
+        (('GetNTP',), 'GetNTP', None),
+        (('GetDNS',), 'GetDNS', None),
+        (('GetNetworkProtocols',), 'GetNetworkProtocols', None),
+        (('GetRelayOutputs',), 'GetRelayOutputs', None),
+        (('SetNTP', 'SetDNS', 'SetNetworkProtocols', 'SetHostname', 'SetNetworkInterfaces'),
+         'Set*', _BODY),
+    ],
+    'media': [
+        (('GetProfile',), 'GetProfile(s)', None),
+        (('GetVideoSources',), 'GetVideoSources', None),
+        (('GetVideoSourceConfiguration',), 'GetVideoSourceConfiguration', None),
+        (('GetVideoEncoderConfiguration',), 'GetVideoEncoderConfiguration',
+         r'<ConfigurationToken[^>]*>([^<]*)</ConfigurationToken>'),
+        (('GetStreamUri',), 'GetStreamUri', None),
+        (('GetSnapshotUri',), 'GetSnapshotUri', None),
+        (('GetVideoSourceConfigurationOptions',), 'GetVideoSourceConfigurationOptions', None),
+        (('GetVideoEncoderConfigurationOptions',), 'GetVideoEncoderConfigurationOptions', None),
+        (('GetGuaranteedNumberOfVideoEncoderInstances',),
+         'GetGuaranteedNumberOfVideoEncoderInstances', None),
+        (('GetAudioSources', 'GetAudioEncoderConfiguration', 'GetAudioEncoderConfigurationOptions',
+          'GetAudioOutputs'), 'GetAudio*', _BODY),
+        (('GetServiceCapabilities',), 'GetServiceCapabilities', None),
+        (('CreateProfile',), 'CreateProfile', r'<Name[^>]*>([^<]+)</Name>'),
+        (('AddVideoSourceConfiguration', 'RemoveVideoSourceConfiguration'), 'Add/RemoveVSC', None),
+        (('AddVideoEncoderConfiguration', 'RemoveVideoEncoderConfiguration'), 'Add/RemoveVEC', None),
+        (('SetVideoEncoderConfiguration', 'SetVideoSourceConfiguration'), 'Set*Configuration', None),
+        (('DeleteProfile',), 'DeleteProfile', r'<ProfileToken[^>]*>([^<]+)</ProfileToken>'),
+    ],
+    'events': [
+        (('GetEventProperties',), 'GetEventProperties', None),
+        (('CreatePullPointSubscription',), 'CreatePullPointSubscription', None),
+        (('PullMessages',), 'PullMessages', None),
+        (('Renew',), 'Renew', None),
+        (('Unsubscribe',), 'Unsubscribe', None),
+    ],
+}
+
+
+def legacy(service, body):
+    """The old do_POST → _auth_ok_soap → _soap_<service> path; returns the branch taken."""
+    if 'GetSystemDateAndTime' in body:           # unauthenticated shortcut to _soap_device
+        service = 'device'
+    else:
+        # _auth_ok_soap (the digest itself is left out: both paths compute it)
+        if re.search(r'<[^:>\s]*:?Username[^>]*>([^<]+)</', body):
+            m_pw = re.search(r'<[^:>\s]*:?Password\b([^>]*)>([^<]+)</', body)
+            if m_pw and 'PasswordDigest' in m_pw.group(1):
+                re.search(r'<[^:>\s]*:?Nonce\b[^>]*>([^<]+)</', body)
+                re.search(r'<[^:>\s]*:?Created\b[^>]*>([^<]+)</', body)
+        re.search(_BODY, body)                   # action name for the log line
+    for needles, branch, pattern in _LEGACY_CHAINS[service]:
+        if any(n in body for n in needles):
+            if pattern:
+                re.search(pattern, body)
+            return branch
+    re.search(_BODY, body)                       # unhandled: action name for the warning
+    return None
+
+
+def table(service, body):
+    """The current path: one _SoapRequest, then the service's action table."""
+    req = server._SoapRequest(body)
+    req.security.get('Username')
+    return server._Handler._SOAP_ACTIONS[service].get(req.action) and req.action
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='SOAP parse / dispatch benchmark')
+    parser.add_argument('captures', nargs='*',
+                        help='capture files (default: soap_captures/*.xml)')
+    parser.add_argument('--number', type=int, default=20000, help='calls per timing run')
+    parser.add_argument('--repeat', type=int, default=5, help='timing runs (best is kept)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    paths = args.captures or sorted(glob.glob(os.path.join(CAPTURES, '*.xml')))
+    print('%-52s %6s %9s %9s %7s  %s' % ('capture', 'bytes', 'old us', 'new us', 'speedup',
+                                         'old branch -> new action'))
+    for path in paths:
+        service = os.path.basename(path).split('_')[1]
+        with open(path, 'rb') as f:
+            raw = f.read()
+        times = []
+        for fn in (legacy, table):
+            timer = timeit.Timer(lambda: fn(service, raw.decode('utf-8', errors='replace')))
+            times.append(min(timer.repeat(args.repeat, args.number)) / args.number * 1e6)
+        body = raw.decode('utf-8', errors='replace')
+        print('%-52s %6d %9.1f %9.1f %6.1fx  %s -> %s' % (
+            os.path.basename(path), len(raw), times[0], times[1], times[0] / times[1],
+            legacy(service, body), table(service, body)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())